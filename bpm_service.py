@@ -3,11 +3,19 @@ BPM lookup and discovery using a local Spotify dataset.
 
 Dataset: https://huggingface.co/datasets/maharshipandya/spotify-tracks-dataset
 Contains ~114K tracks with BPM data.
+
+The CSV is converted once to Snappy-compressed Parquet next to it, so
+later cold starts skip CSV parsing entirely (if data/ is writable).
 """
 
 import os
+import re
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 import streamlit as st
 
 
@@ -16,38 +24,136 @@ _CSV_COLUMNS = [
     "tempo", "track_genre", "popularity",
 ]
 
+_CSV_TYPES = {
+    "track_id": pa.string(),
+    "track_name": pa.string(),
+    "artists": pa.string(),
+    "duration_ms": pa.int32(),
+    "tempo": pa.float32(),
+    "track_genre": pa.string(),
+    "popularity": pa.int16(),
+}
+
+# Keys (and order) of each dict returned by search_tracks_by_bpm
+_RESULT_COLUMNS = [
+    "id", "uri", "name", "artist", "duration_ms", "bpm", "genre", "source",
+]
+
+_DATA_DIR = os.path.join(os.path.dirname(__file__), "data")
+_CSV_PATH = os.path.join(_DATA_DIR, "spotify_tracks.csv")
+_PARQUET_PATH = os.path.join(_DATA_DIR, "spotify_tracks.parquet")
+
 
-# ── Load the CSV once and build a track_id -> tempo lookup ──────────────
-@st.cache_data(show_spinner=False)
-def _load_bpm_dataset() -> dict[str, int]:
+def _load_dataset_table() -> pa.Table | None:
     """
-    Load the Hugging Face Spotify dataset CSV and return a dict
-    mapping track_id -> BPM (int).
+    Read the dataset as an Arrow table, preferring the Parquet copy and
+    converting the CSV on first use (or when the CSV is newer).  Returns
+    None if there is no dataset on disk.
     """
-    csv_path = os.path.join(os.path.dirname(__file__), "data", "spotify_tracks.csv")
-    if not os.path.exists(csv_path):
-        return {}
+    csv_exists = os.path.exists(_CSV_PATH)
+    if os.path.exists(_PARQUET_PATH) and (
+        not csv_exists
+        or os.path.getmtime(_PARQUET_PATH) >= os.path.getmtime(_CSV_PATH)
+    ):
+        return pq.read_table(_PARQUET_PATH, columns=_CSV_COLUMNS)
+    if not csv_exists:
+        return None
+
+    # Arrow's multi-threaded CSV reader, typed up front and straight to Parquet
+    table = pacsv.read_csv(
+        _CSV_PATH,
+        read_options=pacsv.ReadOptions(use_threads=True),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=_CSV_COLUMNS,
+            column_types=_CSV_TYPES,
+        ),
+    )
+    # Write to a unique temp file first so a crash (or a concurrent writer)
+    # never leaves a half-written file.  The Parquet copy is only a speed-up:
+    # if it can't be written (read-only or full disk), use the table as is.
+    tmp_path = f"{_PARQUET_PATH}.{os.getpid()}.tmp"
+    try:
+        pq.write_table(table, tmp_path, compression="snappy", use_dictionary=True)
+        os.replace(tmp_path, _PARQUET_PATH)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    return table
+
+
+def _dataset_mtime() -> float:
+    """
+    Modification time of the source dataset, or 0.0 if missing.  Passed to
+    the cached loaders so editing the dataset invalidates their cache.
+    """
+    for path in (_CSV_PATH, _PARQUET_PATH):
+        if os.path.exists(path):
+            return os.path.getmtime(path)
+    return 0.0
 
-    df = pd.read_csv(csv_path, usecols=["track_id", "tempo"])
-    df = df.dropna(subset=["track_id", "tempo"])
-    # Build dict: track_id -> rounded BPM
-    return {
-        row["track_id"]: int(round(row["tempo"]))
-        for _, row in df.iterrows()
-    }
-
-
-@st.cache_data(show_spinner=False)
-def _load_full_dataset() -> pd.DataFrame:
-    """Load the full CSV with track metadata for discovery searches."""
-    csv_path = os.path.join(os.path.dirname(__file__), "data", "spotify_tracks.csv")
-    if not os.path.exists(csv_path):
+
+# ── Load the dataset once and build a track_id -> tempo lookup ──────────
+# The loaders use cache_resource so every rerun shares one object instead of
+# unpickling a fresh copy; callers must treat the results as read-only.
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _load_full_dataset(mtime: float) -> pd.DataFrame:
+    """
+    Load the full dataset with track metadata for discovery searches.
+
+    Rows are sorted by tempo (stable) so BPM range queries can binary-search
+    a contiguous slice instead of scanning the whole frame.  The index keeps
+    each row's original position in the dataset file.
+    """
+    table = _load_dataset_table()
+    if table is None:
         return pd.DataFrame()
 
-    df = pd.read_csv(csv_path, usecols=_CSV_COLUMNS)
+    df = table.to_pandas()
     df = df.dropna(subset=["track_id", "tempo"])
-    df["tempo"] = df["tempo"].round().astype(int)
-    return df
+    # Narrow dtypes: every later mask/sort/sample moves fewer bytes
+    df["tempo"] = df["tempo"].round().astype("uint16")
+    df["popularity"] = df["popularity"].fillna(0).astype("uint8")
+    df["duration_ms"] = df["duration_ms"].fillna(210000).astype("uint32")
+    df["track_genre"] = df["track_genre"].fillna("").astype("category")
+    df["artists"] = df["artists"].fillna("").astype("string[pyarrow]")
+    return df.sort_values("tempo", kind="mergesort")
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _load_bpm_dataset(mtime: float) -> tuple[dict[str, int], np.ndarray]:
+    """
+    Build the BPM lookup from the full dataset and return
+    (id_to_code, bpm_by_code): a dict mapping track_id -> dense integer
+    code, and an int16 array of rounded BPMs indexed by that code.
+    """
+    df = _load_full_dataset(mtime)
+    if df.empty:
+        return {}, np.empty(0, dtype=np.int16)
+
+    # Back in file order so a duplicated id keeps its last row's BPM, then
+    # dictionary-encode the (now unique) track ids
+    lookup = df[["track_id", "tempo"]].sort_index().drop_duplicates("track_id", keep="last")
+    ids = lookup["track_id"].to_numpy()
+    bpm_by_code = lookup["tempo"].to_numpy(dtype=np.int16)
+    id_to_code = dict(zip(ids.tolist(), range(len(ids))))
+    return id_to_code, bpm_by_code
+
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def _load_genre_index(mtime: float) -> dict[str, np.ndarray]:
+    """
+    Map each lowercased genre to the row positions of its tracks in the
+    tempo-sorted dataset.  Positions are ascending, so they can be
+    binary-searched against a BPM slice.
+    """
+    df = _load_full_dataset(mtime)
+    if df.empty:
+        return {}
+
+    genres = df["track_genre"].str.lower()
+    return dict(genres.groupby(genres, sort=False).indices)
 
 
 def enrich_tracks_with_bpm(
@@ -56,22 +162,30 @@ def enrich_tracks_with_bpm(
 ) -> list[dict]:
     """
     Given a list of track dicts (with 'id', 'name', 'artist'), add a 'bpm'
-    key to each using the local CSV dataset.
+    key to each using the local dataset.
 
     Tracks not found in the dataset will have bpm=None and will be excluded
     from the workout playlist.
 
     progress_callback(current, total) is called so the UI can update a
-    progress bar.
+    progress bar.  It fires at most ~20 times, not once per track.
     """
-    dataset = _load_bpm_dataset()
+    id_to_code, bpm_by_code = _load_bpm_dataset(_dataset_mtime())
     total = len(tracks)
+    if not total:
+        return tracks
+
+    # Resolve every id to its code in one pass, then gather BPMs by code
+    codes = pd.Series([t["id"] for t in tracks], dtype=object).map(id_to_code)
+    found = codes.notna().to_numpy()
+    bpms = np.zeros(total, dtype=np.int32)
+    bpms[found] = bpm_by_code[codes[found].to_numpy(dtype=np.intp)]
 
-    for i, track in enumerate(tracks):
-        bpm = dataset.get(track["id"])
-        track["bpm"] = bpm if (bpm is not None and bpm > 0) else None
+    step = max(1, total // 20)
+    for i, (track, bpm) in enumerate(zip(tracks, bpms.tolist())):
+        track["bpm"] = bpm if bpm > 0 else None
 
-        if progress_callback:
+        if progress_callback and (i % step == 0 or i == total - 1):
             progress_callback(i + 1, total)
 
     return tracks
@@ -85,9 +199,10 @@ def search_tracks_by_bpm(
     limit: int = 50,
     artist_hints: list[str] | None = None,
     diverse: bool = True,
+    seed: int | None = None,
 ) -> list[dict]:
     """
-    Search the local CSV dataset for tracks within a BPM range.
+    Search the local dataset for tracks within a BPM range.
 
     Parameters
     ----------
@@ -106,33 +221,49 @@ def search_tracks_by_bpm(
     diverse : bool
         If True (default), mix popular and less-popular tracks so the
         pool varies across runs.  If False, return top-N by popularity.
+    seed : int or None
+        Seed for the random sampling/shuffle, for reproducible results.
+        If None, results vary across runs.
 
     Returns
     -------
     list[dict]
         Each dict has: id, uri, name, artist, duration_ms, bpm, genre.
     """
-    df = _load_full_dataset()
+    rng = np.random.default_rng(seed)
+    mtime = _dataset_mtime()
+    df = _load_full_dataset(mtime)
     if df.empty:
         return []
 
-    # Filter by BPM range
-    mask = (df["tempo"] >= min_bpm) & (df["tempo"] <= max_bpm)
+    # BPM, genre and exclude filters all narrow one array of row positions;
+    # the matching rows are materialised with a single take at the end.
 
-    # Filter by genre(s) if provided
+    # Filter by BPM range: binary-search the tempo-sorted frame for the slice
+    tempos = df["tempo"].to_numpy()
+    lo = np.searchsorted(tempos, min_bpm, side="left")
+    hi = np.searchsorted(tempos, max_bpm, side="right")
+    rows = np.arange(lo, hi)
+
+    # Filter by genre(s) if provided, using the precomputed genre -> rows index
     if genre:
         genre_parts = [g.strip().lower() for g in genre.split(",") if g.strip()]
-        if genre_parts:
-            genre_mask = df["track_genre"].str.lower().isin(genre_parts)
-            # If genre filter yields results, use it; otherwise skip
-            if genre_mask.any():
-                mask = mask & genre_mask
-
-    df_filtered = df[mask].copy()
+        genre_index = _load_genre_index(mtime)
+        # If any requested genre exists in the dataset, restrict to it;
+        # otherwise skip the genre filter
+        if any(g in genre_index for g in genre_parts):
+            hits = []
+            for g in dict.fromkeys(genre_parts):
+                g_rows = genre_index.get(g)
+                if g_rows is not None:
+                    hits.append(g_rows[np.searchsorted(g_rows, lo):np.searchsorted(g_rows, hi)])
+            rows = np.sort(np.concatenate(hits))
 
     # Exclude already-selected track IDs
-    if exclude_ids:
-        df_filtered = df_filtered[~df_filtered["track_id"].isin(exclude_ids)]
+    if exclude_ids and rows.size:
+        rows = rows[~df["track_id"].take(rows).isin(exclude_ids).to_numpy()]
+
+    df_filtered = df.iloc[rows]
 
     if df_filtered.empty:
         return []
@@ -141,10 +272,11 @@ def search_tracks_by_bpm(
     # Separate artist-matched rows so they get priority slots
     artist_rows = pd.DataFrame()
     if artist_hints:
-        patterns = [ah.lower() for ah in artist_hints if ah]
+        patterns = [re.escape(ah) for ah in artist_hints if ah]
         if patterns:
-            artist_mask = df_filtered["artists"].str.lower().apply(
-                lambda a: any(p in str(a) for p in patterns)
+            # One vectorized regex pass instead of a Python lambda per row
+            artist_mask = df_filtered["artists"].str.contains(
+                "|".join(patterns), case=False, regex=True, na=False
             )
             artist_rows = df_filtered[artist_mask]
             # Remove artist rows from general pool to avoid doubles
@@ -152,17 +284,19 @@ def search_tracks_by_bpm(
 
     # ── Diversity sampling ──────────────────────────────────────────
     if diverse and len(df_filtered) > limit:
-        # Split into popular half and less-popular half
-        df_sorted = df_filtered.sort_values("popularity", ascending=False)
-        mid = len(df_sorted) // 2
-        top_half = df_sorted.iloc[:mid]
-        bottom_half = df_sorted.iloc[mid:]
+        # Split into popular half and less-popular half.  Only the split
+        # point matters (both halves are sampled), so partition instead of sort.
+        pop = df_filtered["popularity"].to_numpy()
+        split = len(pop) - len(pop) // 2
+        order = np.argpartition(pop, min(split, len(pop) - 1))
+        top_half = df_filtered.iloc[order[split:]]
+        bottom_half = df_filtered.iloc[order[:split]]
 
         # Take 60% from top, 40% from bottom (randomly sampled)
         n_top = int(limit * 0.6)
         n_bottom = limit - n_top
-        top_sample = top_half.sample(n=min(n_top, len(top_half)), random_state=None)
-        bottom_sample = bottom_half.sample(n=min(n_bottom, len(bottom_half)), random_state=None)
+        top_sample = top_half.sample(n=min(n_top, len(top_half)), random_state=rng)
+        bottom_sample = bottom_half.sample(n=min(n_bottom, len(bottom_half)), random_state=rng)
         df_filtered = pd.concat([top_sample, bottom_sample])
     else:
         df_filtered = df_filtered.sort_values("popularity", ascending=False).head(limit)
@@ -174,21 +308,16 @@ def search_tracks_by_bpm(
         artist_rows = artist_rows.sort_values("popularity", ascending=False).head(artist_cap)
         df_filtered = pd.concat([artist_rows, df_filtered]).head(limit)
 
-    # Shuffle so the order isn't deterministic
-    df_filtered = df_filtered.sample(frac=1, random_state=None)
-
-    # Build result list
-    results = []
-    for _, row in df_filtered.iterrows():
-        results.append({
-            "id": row["track_id"],
-            "uri": f"spotify:track:{row['track_id']}",
-            "name": row["track_name"],
-            "artist": row["artists"],
-            "duration_ms": int(row["duration_ms"]) if pd.notna(row["duration_ms"]) else 210000,
-            "bpm": int(row["tempo"]),
-            "genre": row["track_genre"] if pd.notna(row["track_genre"]) else "",
-            "source": "discovery",
-        })
-
-    return results
+    # Build result list (column-wise fixups, then one records conversion)
+    results = df_filtered.assign(
+        uri="spotify:track:" + df_filtered["track_id"].astype(str),
+        duration_ms=df_filtered["duration_ms"].astype(int),
+        bpm=df_filtered["tempo"].astype(int),
+        genre=df_filtered["track_genre"].astype(str),
+        source="discovery",
+    ).rename(columns={"track_id": "id", "track_name": "name", "artists": "artist"})
+
+    records = results[_RESULT_COLUMNS].to_dict(orient="records")
+    # Shuffle so the order isn't deterministic (cheap on the final list)
+    rng.shuffle(records)
+    return records
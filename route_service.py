@@ -6,14 +6,36 @@ Geocodes a start location, computes a round-trip route by target distance
 plus elevation profile for display.
 """
 
+import functools
+import json
 import math
 import os
+import sqlite3
+import time
+from contextlib import closing
 from typing import Any
 
+import numpy as np
 import requests
+from requests.adapters import HTTPAdapter
 
 ORS_BASE = "https://api.openrouteservice.org"
 DEFAULT_STRIDE_M = 1.35
+EARTH_RADIUS_M = 6371000
+# Turn points closer than this (and not past this latitude) use the
+# flat-earth projection
+FLAT_EARTH_MAX_M = 10_000
+FLAT_EARTH_MAX_LAT = 60.0
+
+# On-disk cache for ORS lookups (lives next to the BPM dataset)
+CACHE_DB_PATH = os.path.join(os.path.dirname(__file__), "data", "ors_cache.sqlite")
+GEOCODE_CACHE_TTL_S = 30 * 24 * 3600
+ROUTE_CACHE_TTL_S = 7 * 24 * 3600
+
+# One pooled session for all ORS calls so repeat requests reuse the
+# TCP/TLS connection instead of handshaking every time
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(pool_connections=10, pool_maxsize=20))
 
 # Walking routes follow roads, so actual path is often 2x+ straight-line.
 # Use a closer turn point so the returned route length matches target distance.
@@ -52,55 +74,49 @@ def format_pace(min_per_km: float, unit: str = "km") -> str:
 
 def _decode_polyline(encoded: str, is_3d: bool = False) -> list[list[float]]:
     """Decode ORS encoded polyline into list of [lon, lat] or [lon, lat, elev]."""
-    points = []
+    # Pass 1: decode every varint delta, indexing the ASCII bytes directly
+    # (an int per char) instead of calling ord() per char
+    data = encoded.encode("ascii")
+    n = len(data)
+    dims = 3 if is_3d else 2
+    deltas: list[int] = []
     index = 0
-    lat = 0
-    lng = 0
-    z = 0
-    n = len(encoded)
 
     while index < n:
         result = 1
         shift = 0
         while True:
-            b = ord(encoded[index]) - 63 - 1
+            b = data[index] - 64
             index += 1
             result += b << shift
             shift += 5
             if b < 0x1F:
                 break
-        lat += ~(result >> 1) if (result & 1) != 0 else (result >> 1)
-
-        result = 1
-        shift = 0
-        while True:
-            b = ord(encoded[index]) - 63 - 1
-            index += 1
-            result += b << shift
-            shift += 5
-            if b < 0x1F:
+            if index >= n:
+                # Only a trailing elevation may be cut short (keeps its partial value)
+                if len(deltas) % dims != 2:
+                    raise IndexError("truncated polyline")
                 break
-        lng += ~(result >> 1) if (result & 1) != 0 else (result >> 1)
-
-        if is_3d:
-            result = 1
-            shift = 0
-            while True:
-                b = ord(encoded[index]) - 63 - 1
-                index += 1
-                result += b << shift
-                shift += 5
-                if b < 0x1F:
-                    break
-                if index >= n:
-                    break
-            if index <= n:
-                z += ~(result >> 1) if (result & 1) != 0 else (result >> 1)
-            points.append([round(lng * 1e-5, 6), round(lat * 1e-5, 6), round(z * 1e-2, 1)])
-        else:
-            points.append([round(lng * 1e-5, 6), round(lat * 1e-5, 6)])
-
-    return points
+        deltas.append(~(result >> 1) if (result & 1) != 0 else (result >> 1))
+
+    if len(deltas) % dims:
+        raise IndexError("truncated polyline")
+
+    # Pass 2: running sums per dimension give absolute coordinates; scale and
+    # round the whole (n, dims) array at once instead of per point
+    if not deltas:
+        return []
+    coords = np.cumsum(np.asarray(deltas, dtype=np.int64).reshape(-1, dims), axis=0)
+    lnglat = np.round(coords[:, [1, 0]] * 1e-5, 6)
+    if is_3d:
+        z = coords[:, 2]
+        elev = np.round(z * 1e-2, 1)
+        # np.round scales by 10 before rounding, so at .x5 ties (centimetre
+        # values ending in 5) it can disagree with round(); redo those exactly
+        ties = np.flatnonzero(z % 10 == 5)
+        elev[ties] = [round(v * 1e-2, 1) for v in z[ties].tolist()]
+        return np.column_stack((lnglat, elev)).tolist()
+    return lnglat.tolist()
 
 
 # ── Geocoding ─────────────────────────────────────────────────────────────
@@ -112,14 +128,44 @@ def _api_key() -> str:
 def geocode_address(address: str) -> tuple[float, float] | None:
     """
     Geocode a free-text address via ORS. Returns (lon, lat) or None.
+
+    Results are cached in memory and in an on-disk SQLite table keyed by the
+    normalized address, so repeat lookups skip the network entirely.
     """
-    key = _api_key()
-    if not key:
+    if not _api_key():
+        return None
+    try:
+        return _geocode_cached(_normalize_address(address))
+    except LookupError:
         return None
+
+
+def _normalize_address(address: str) -> str:
+    """Case- and whitespace-insensitive cache key for an address."""
+    return " ".join(address.lower().split())
+
+
+@functools.lru_cache(maxsize=1024)
+def _geocode_cached(address: str) -> tuple[float, float]:
+    """
+    Resolve a normalized address via the disk cache, then ORS.  Raises
+    LookupError on failure so that misses are never memoized.
+    """
+    coords = _cache_get_geocode(address)
+    if coords is None:
+        coords = _geocode_request(address)
+        if coords is None:
+            raise LookupError(address)
+        _cache_put_geocode(address, coords)
+    return coords
+
+
+def _geocode_request(address: str) -> tuple[float, float] | None:
+    """Query the ORS geocode endpoint. Returns (lon, lat) or None."""
     url = f"{ORS_BASE}/geocode/search"
-    params = {"api_key": key, "text": address}
+    params = {"api_key": _api_key(), "text": address}
     try:
-        r = requests.get(url, params=params, timeout=10)
+        r = _SESSION.get(url, params=params, timeout=10)
         r.raise_for_status()
         data = r.json()
         features = data.get("features") or []
@@ -133,6 +179,93 @@ def geocode_address(address: str) -> tuple[float, float] | None:
     return None
 
 
+# ── Persistent cache (SQLite) ─────────────────────────────────────────────
+
+def _cache_conn() -> sqlite3.Connection:
+    """Open the on-disk ORS cache, creating its tables on first use."""
+    os.makedirs(os.path.dirname(CACHE_DB_PATH), exist_ok=True)
+    conn = sqlite3.connect(CACHE_DB_PATH, timeout=5)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS geocode_cache "
+        "(addr TEXT PRIMARY KEY, lon REAL, lat REAL, ts INTEGER)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS route_cache "
+        "(key TEXT PRIMARY KEY, payload TEXT, ts INTEGER)"
+    )
+    return conn
+
+
+def _cache_get_geocode(address: str) -> tuple[float, float] | None:
+    """Return cached (lon, lat) for a normalized address, or None."""
+    try:
+        with closing(_cache_conn()) as conn:
+            row = conn.execute(
+                "SELECT lon, lat FROM geocode_cache WHERE addr = ? AND ts >= ?",
+                (address, int(time.time()) - GEOCODE_CACHE_TTL_S),
+            ).fetchone()
+    except (sqlite3.Error, OSError):
+        return None
+    return (row[0], row[1]) if row else None
+
+
+def _cache_put_geocode(address: str, coords: tuple[float, float]) -> None:
+    """Store a geocode result and evict expired rows. Errors are ignored."""
+    now = int(time.time())
+    try:
+        with closing(_cache_conn()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO geocode_cache VALUES (?, ?, ?, ?)",
+                (address, coords[0], coords[1], now),
+            )
+            conn.execute(
+                "DELETE FROM geocode_cache WHERE ts < ?",
+                (now - GEOCODE_CACHE_TTL_S,),
+            )
+    except (sqlite3.Error, OSError):
+        pass
+
+
+def _route_cache_key(lon: float, lat: float, half_m: float, bearing_deg: float) -> str:
+    """Cache key for a round trip: ~10 m start cell, 100 m turn distance bucket."""
+    return f"{lon:.4f},{lat:.4f},{int(half_m)},{bearing_deg:g}"
+
+
+def _cache_get_route(key: str) -> dict[str, Any] | None:
+    """Return a cached ORS directions response, or None."""
+    try:
+        with closing(_cache_conn()) as conn:
+            row = conn.execute(
+                "SELECT payload FROM route_cache WHERE key = ? AND ts >= ?",
+                (key, int(time.time()) - ROUTE_CACHE_TTL_S),
+            ).fetchone()
+    except (sqlite3.Error, OSError):
+        return None
+    if not row:
+        return None
+    try:
+        return json.loads(row[0])
+    except ValueError:
+        return None
+
+
+def _cache_put_route(key: str, data: dict[str, Any]) -> None:
+    """Store an ORS directions response and evict expired rows. Errors are ignored."""
+    now = int(time.time())
+    try:
+        with closing(_cache_conn()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO route_cache VALUES (?, ?, ?)",
+                (key, json.dumps(data, separators=(",", ":")), now),
+            )
+            conn.execute(
+                "DELETE FROM route_cache WHERE ts < ?",
+                (now - ROUTE_CACHE_TTL_S,),
+            )
+    except (sqlite3.Error, OSError):
+        pass
+
+
 def parse_coords(lat_lng_str: str) -> tuple[float, float] | None:
     """
     Parse "lat,lng" or "lat, lng" string. Returns (lon, lat) for API use.
@@ -153,11 +286,29 @@ def parse_coords(lat_lng_str: str) -> tuple[float, float] | None:
 
 # ── Turn point (project distance from start) ──────────────────────────────
 
-def _project_point(lon: float, lat: float, distance_m: float, bearing_deg: float = 0.0) -> tuple[float, float]:
-    """Project a point by distance_m in direction bearing_deg (0=North, 90=East)."""
-    # Approximate: 1 deg lat ≈ 111320 m; 1 deg lon ≈ 111320*cos(lat) m
-    d_km = distance_m / 1000.0
+def _project_point(
+    lon: float,
+    lat: float,
+    distance_m: float,
+    bearing_deg: float = 0.0,
+    exact: bool = False,
+) -> tuple[float, float]:
+    """
+    Project a point by distance_m in direction bearing_deg (0=North, 90=East).
+
+    Short hops at |lat| <= 60° use a flat-earth offset: exact due north or
+    south, and within ~16 m of the spherical result at 10 km on any other
+    bearing -- well inside ORS's snap-to-road.  Longer hops, higher
+    latitudes, or exact=True use the spherical formula.
+    """
     br = math.radians(bearing_deg)
+    if not exact and distance_m <= FLAT_EARTH_MAX_M and abs(lat) <= FLAT_EARTH_MAX_LAT:
+        d = distance_m / EARTH_RADIUS_M  # angular distance (rad)
+        lat2 = lat + math.degrees(d * math.cos(br))
+        lon2 = lon + math.degrees(d * math.sin(br) / math.cos(math.radians(lat)))
+        return (lon2, lat2)
+
+    d_km = distance_m / 1000.0
     # Simple spherical approximation
     R = 6371  # km
     lat2 = math.asin(
@@ -216,10 +367,12 @@ def get_running_route(
     speed_m_per_min = 1000.0 / pace_min_per_km
     target_distance_m = speed_m_per_min * workout_minutes
     # Use a closer turn point: real paths are ~PATH_OVERHEAD_FACTOR x straight-line
-    half_m = (target_distance_m / 2.0) / PATH_OVERHEAD_FACTOR
+    # Snapped to 100 m so similar workouts share a cached route
+    half_m = round((target_distance_m / 2.0) / PATH_OVERHEAD_FACTOR / 100.0) * 100.0
+    bearing_deg = 0.0
 
     # Turn point (north then back)
-    turn_lon, turn_lat = _project_point(lon, lat, half_m, 0.0)
+    turn_lon, turn_lat = _project_point(lon, lat, half_m, bearing_deg)
 
     # ORS: coordinates as [lon, lat]
     coordinates = [[lon, lat], [turn_lon, turn_lat], [lon, lat]]
@@ -231,12 +384,17 @@ def get_running_route(
         "elevation": True,
     }
 
-    try:
-        r = requests.post(url, json=body, headers=headers, timeout=30)
-        r.raise_for_status()
-        data = r.json()
-    except Exception:
-        return None
+    cache_key = _route_cache_key(lon, lat, half_m, bearing_deg)
+    data = _cache_get_route(cache_key)
+    if data is None:
+        try:
+            r = _SESSION.post(url, json=body, headers=headers, timeout=30)
+            r.raise_for_status()
+            data = r.json()
+        except Exception:
+            return None
+        if data.get("routes"):
+            _cache_put_route(cache_key, data)
 
     routes = data.get("routes") or []
     if not routes:
@@ -272,15 +430,7 @@ def get_running_route(
                 points.append([lon, lat])
 
     # Build elevation profile (cumulative distance, elevation)
-    elevation_profile: list[dict[str, float]] = []
-    has_elev = points and len(points[0]) >= 3
-    cum = 0.0
-    for i, pt in enumerate(points):
-        if i > 0:
-            lon0, lat0 = points[i - 1][0], points[i - 1][1]
-            cum += _haversine_m(lon0, lat0, pt[0], pt[1])
-        elev = pt[2] if has_elev and len(pt) >= 3 else 0.0
-        elevation_profile.append({"distance_m": round(cum, 1), "elev_m": elev})
+    elevation_profile = _elevation_profile(points)
 
     return {
         "geometry": points,
@@ -290,9 +440,32 @@ def get_running_route(
     }
 
 
+def _elevation_profile(points: list[list[float]]) -> list[dict[str, float]]:
+    """
+    Cumulative distance and elevation at each route point, computed in one
+    vectorized pass (segment haversines over the whole array, then cumsum).
+    """
+    if not points:
+        return []
+    pts = np.asarray(points, dtype=np.float64)
+    lons = np.radians(pts[:, 0])
+    lats = np.radians(pts[:, 1])
+    a = (
+        np.sin(np.diff(lats) / 2) ** 2
+        + np.cos(lats[:-1]) * np.cos(lats[1:]) * np.sin(np.diff(lons) / 2) ** 2
+    )
+    seg = 2 * EARTH_RADIUS_M * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    cum = np.concatenate(([0.0], np.cumsum(seg))).round(1)
+    elevs = pts[:, 2] if pts.shape[1] >= 3 else np.zeros(len(pts))
+    return [
+        {"distance_m": d, "elev_m": e}
+        for d, e in zip(cum.tolist(), elevs.tolist())
+    ]
+
+
 def _haversine_m(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
     """Distance in meters between two WGS84 points."""
-    R = 6371000  # m
+    R = EARTH_RADIUS_M
     phi1 = math.radians(lat1)
     phi2 = math.radians(lat2)
     dphi = math.radians(lat2 - lat1)
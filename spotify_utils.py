@@ -3,6 +3,8 @@ Spotify OAuth + playlist/track helpers for Streamlit.
 """
 
 import os
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
@@ -14,6 +16,9 @@ SCOPES = " ".join([
     "playlist-modify-private",
 ])
 
+# Concurrent page requests when paging through playlists/tracks
+PAGE_FETCH_WORKERS = 8
+
 
 def _get_auth_manager() -> SpotifyOAuth:
     """Return a SpotifyOAuth manager configured from env vars."""
@@ -77,26 +82,45 @@ def get_spotify_client() -> spotipy.Spotify | None:
     return spotipy.Spotify(auth_manager=auth_manager)
 
 
+def _fetch_all_items(first_page: dict, fetch_page) -> list[dict]:
+    """
+    Return the items of every page of a Spotify paging object.
+
+    The first page reveals the total, so the remaining pages are requested
+    concurrently by offset via fetch_page(offset) instead of following
+    "next" links one round-trip at a time.  Page order is preserved.
+    """
+    items = list(first_page["items"])
+    limit = first_page["limit"]
+    if not limit:
+        return items
+    offsets = range(first_page["offset"] + limit, first_page["total"], limit)
+    if offsets:
+        with ThreadPoolExecutor(max_workers=PAGE_FETCH_WORKERS) as pool:
+            for page in pool.map(fetch_page, offsets):
+                if page:
+                    items.extend(page["items"])
+    return items
+
+
 def fetch_user_playlists(sp: spotipy.Spotify) -> list[dict]:
     """
     Return a list of the current user's playlists.
     Each dict has keys: id, name, image_url, track_count.
     """
-    playlists = []
-    results = sp.current_user_playlists(limit=50)
-    while results:
-        for item in results["items"]:
-            playlists.append({
-                "id": item["id"],
-                "name": item["name"],
-                "image_url": item["images"][0]["url"] if item.get("images") else None,
-                "track_count": item["tracks"]["total"],
-            })
-        if results["next"]:
-            results = sp.next(results)
-        else:
-            break
-    return playlists
+    items = _fetch_all_items(
+        sp.current_user_playlists(limit=50),
+        lambda offset: sp.current_user_playlists(limit=50, offset=offset),
+    )
+    return [
+        {
+            "id": item["id"],
+            "name": item["name"],
+            "image_url": item["images"][0]["url"] if item.get("images") else None,
+            "track_count": item["tracks"]["total"],
+        }
+        for item in items
+    ]
 
 
 def fetch_playlist_tracks(sp: spotipy.Spotify, playlist_id: str) -> list[dict]:
@@ -104,29 +128,27 @@ def fetch_playlist_tracks(sp: spotipy.Spotify, playlist_id: str) -> list[dict]:
     Return all tracks from a playlist.
     Each dict has keys: id, uri, name, artist, duration_ms, album_art.
     """
+    items = _fetch_all_items(
+        sp.playlist_tracks(playlist_id, limit=100),
+        lambda offset: sp.playlist_tracks(playlist_id, limit=100, offset=offset),
+    )
     tracks = []
-    results = sp.playlist_tracks(playlist_id, limit=100)
-    while results:
-        for item in results["items"]:
-            track = item.get("track")
-            if not track or not track.get("id"):
-                continue  # skip local/unavailable tracks
-            tracks.append({
-                "id": track["id"],
-                "uri": track["uri"],
-                "name": track["name"],
-                "artist": ", ".join(a["name"] for a in track["artists"]),
-                "duration_ms": track["duration_ms"],
-                "album_art": (
-                    track["album"]["images"][-1]["url"]
-                    if track.get("album", {}).get("images")
-                    else None
-                ),
-            })
-        if results["next"]:
-            results = sp.next(results)
-        else:
-            break
+    for item in items:
+        track = item.get("track")
+        if not track or not track.get("id"):
+            continue  # skip local/unavailable tracks
+        tracks.append({
+            "id": track["id"],
+            "uri": track["uri"],
+            "name": track["name"],
+            "artist": ", ".join(a["name"] for a in track["artists"]),
+            "duration_ms": track["duration_ms"],
+            "album_art": (
+                track["album"]["images"][-1]["url"]
+                if track.get("album", {}).get("images")
+                else None
+            ),
+        })
     return tracks
 
 
@@ -7,7 +7,8 @@ Builds a trapezoidal BPM profile:
 """
 
 from __future__ import annotations
-import random
+
+import numpy as np
 
 
 # ── Phase splits (fractions of total workout duration) ──────────────────
@@ -25,14 +26,14 @@ def _fill_phase(
     until we reach ~target_ms of total duration.  Tries not to overshoot
     by more than one song.
     """
-    picked: list[dict] = []
-    total = 0
-    for track in candidates:
-        picked.append(track)
-        total += track["duration_ms"]
-        if total >= target_ms:
-            break
-    return picked
+    if not candidates:
+        return []
+    # Running total of durations; the cutoff is the first track reaching target
+    cumdur = np.cumsum(np.fromiter(
+        (t["duration_ms"] for t in candidates), dtype=np.int64, count=len(candidates)
+    ))
+    cut = int(np.searchsorted(cumdur, target_ms, side="left"))
+    return candidates[:cut + 1]
 
 
 def build_workout_playlist(
@@ -41,6 +42,7 @@ def build_workout_playlist(
     warmup_frac: float | None = None,
     peak_frac: float | None = None,
     cooldown_frac: float | None = None,
+    seed: int | None = None,
 ) -> list[dict]:
     """
     Given *tracks* (each must have 'bpm' and 'duration_ms') and a workout
@@ -48,7 +50,8 @@ def build_workout_playlist(
     BPM curve:  warmup (ascending) → peak (high) → cooldown (descending).
 
     Custom phase fractions can be supplied (from the AI coach); if omitted
-    the module-level defaults are used.
+    the module-level defaults are used.  *seed* makes the peak-phase
+    shuffle reproducible; if None it differs on every call.
 
     Tracks with bpm=None are excluded.
     """
@@ -56,19 +59,17 @@ def build_workout_playlist(
     pf = peak_frac if peak_frac is not None else PEAK_FRAC
     cf = cooldown_frac if cooldown_frac is not None else COOLDOWN_FRAC
 
-    # Filter out tracks with no BPM data and deduplicate by track id
-    seen_ids: set[str] = set()
-    valid: list[dict] = []
-    for t in tracks:
-        if t.get("bpm") is not None and t["id"] not in seen_ids:
-            seen_ids.add(t["id"])
-            valid.append(t)
+    # Filter out tracks with no BPM data and deduplicate by track id in one
+    # pass (dicts keep first-insertion order; a later duplicate's dict wins)
+    valid = list({t["id"]: t for t in tracks if t.get("bpm") is not None}.values())
 
     if not valid:
         return []
 
-    # Sort all tracks by BPM
-    valid.sort(key=lambda t: t["bpm"])
+    # Sort all tracks by BPM once (stable argsort over a packed BPM array);
+    # every pool below is a slice of this order, so no further sorts needed
+    bpms = np.fromiter((t["bpm"] for t in valid), dtype=np.int32, count=len(valid))
+    valid = [valid[i] for i in np.argsort(bpms, kind="stable").tolist()]
 
     total_ms = workout_minutes * 60 * 1000
     warmup_ms = int(total_ms * wf)
@@ -84,17 +85,15 @@ def build_workout_playlist(
     mid_pool = valid[low_end:high_start] if low_end < high_start else []
     high_pool = valid[high_start:] if high_start < n else valid[-1:]
 
-    # For warmup: low → mid (ascending BPM)
-    warmup_candidates = sorted(low_pool + mid_pool, key=lambda t: t["bpm"])
+    # For warmup: low → mid (ascending BPM; the slices are already in order)
+    warmup_candidates = low_pool + mid_pool
 
     # For peak: highest BPM tracks, shuffled so it's not monotone
-    peak_candidates = list(high_pool)
-    random.shuffle(peak_candidates)
+    rng = np.random.default_rng(seed)
+    peak_candidates = [high_pool[i] for i in rng.permutation(len(high_pool)).tolist()]
 
     # For cooldown: mid → low (descending BPM), reuse low/mid pools
-    cooldown_candidates = sorted(
-        low_pool + mid_pool, key=lambda t: t["bpm"], reverse=True
-    )
+    cooldown_candidates = warmup_candidates[::-1]
 
     # ── Fill each phase ─────────────────────────────────────────────────
     warmup = _fill_phase(warmup_candidates, warmup_ms)
@@ -105,9 +104,7 @@ def build_workout_playlist(
     # If a phase is empty, redistribute whatever we have
     if not warmup and not cooldown:
         # Everything is peak
-        return _fill_phase(
-            sorted(valid, key=lambda t: t["bpm"]), total_ms
-        )
+        return _fill_phase(valid, total_ms)
 
     playlist = warmup + peak + cooldown
     return playlist
@@ -119,12 +116,13 @@ def playlist_stats(playlist: list[dict]) -> dict:
         return {"total_tracks": 0, "total_duration_min": 0, "avg_bpm": 0,
                 "min_bpm": 0, "max_bpm": 0}
 
-    bpms = [t["bpm"] for t in playlist if t.get("bpm")]
-    total_dur_ms = sum(t["duration_ms"] for t in playlist)
+    bpms = np.fromiter((t["bpm"] for t in playlist if t.get("bpm")), dtype=np.int64)
+    durs = np.fromiter((t["duration_ms"] for t in playlist), dtype=np.int64, count=len(playlist))
+    has_bpm = bpms.size > 0
     return {
         "total_tracks": len(playlist),
-        "total_duration_min": round(total_dur_ms / 60000, 1),
-        "avg_bpm": round(sum(bpms) / len(bpms)) if bpms else 0,
-        "min_bpm": min(bpms) if bpms else 0,
-        "max_bpm": max(bpms) if bpms else 0,
+        "total_duration_min": round(int(durs.sum()) / 60000, 1),
+        "avg_bpm": round(int(bpms.sum()) / bpms.size) if has_bpm else 0,
+        "min_bpm": int(bpms.min()) if has_bpm else 0,
+        "max_bpm": int(bpms.max()) if has_bpm else 0,
     }